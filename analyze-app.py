@@ -1,46 +1,79 @@
 import os
+import math
 import yfinance as yf
+import numpy as np
 import pandas as pd
+from numba import njit, types
 from flask import Flask, request, abort
 from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError
+from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import MessageEvent, TextMessage, TextSendMessage
-from datetime import datetime
+from datetime import datetime, time as dtime
 import time  # Changed to standard time module
 import pytz  # 加入 pytz 模組
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 
 #======讓render不會睡著======
 import threading 
+import atexit
 import requests
+
+WAKE_UP_URL = 'https://line-bot-python-on-render-0v9a.onrender.com/' + 'render_wake_up'
+WAKE_UP_INTERVAL = 10*60
+_SESSION = requests.Session()  # 重複使用連線，不必每次重新 TLS 握手
+_STOP = threading.Event()
+
 def wake_up_render():
-    while 1==1:
-        url = 'https://line-bot-python-on-render-0v9a.onrender.com/' + 'render_wake_up'
-        res = requests.get(url)
-        if res.status_code==200:
+    wait = WAKE_UP_INTERVAL
+    backoff = 30
+    while not _STOP.wait(wait):
+        try:
+            res = _SESSION.get(WAKE_UP_URL, timeout=10)
+            ok = res.status_code == 200
+        except requests.RequestException as e:
+            print(f"[ERROR] wake up request failed: {e}")
+            ok = False
+        if ok:
             print('喚醒render成功')
+            wait = WAKE_UP_INTERVAL
+            backoff = 30
         else:
+            # 失敗時提早重試，間隔逐次加倍，最多 10 分鐘
             print('喚醒失敗')
-        time.sleep(10*60)
+            wait = min(WAKE_UP_INTERVAL, backoff)
+            backoff *= 2
 
-threading.Thread(target=wake_up_render).start()
+atexit.register(_STOP.set)
+threading.Thread(target=wake_up_render, daemon=True).start()
 #======讓render不會睡著===end===
 
 
+_STOCK_RE = re.compile(r"^\d{4}(?:\.(?:TW|TWO))?$")
+
 def is_stock_code(text: str) -> bool:
     """判斷輸入是否為台灣股票代碼 (上市 .TW 或 上櫃 .TWO)"""
-    return bool(re.match(r"^\d{4}(\.(TW|TWO))?$", text.strip()))
+    return _STOCK_RE.match(text.strip()) is not None
+
+_TZ = pytz.timezone('Asia/Taipei')  # 使用台灣時區
+_MARKET_START = dtime(9, 0)
+_MARKET_END = dtime(13, 30)
+
+_MKT_CACHE = [0.0, False]  # [到期時間 (monotonic), 是否開盤]
+
+def _compute_is_open():
+    now = datetime.now(_TZ)
+    # 週六週日不開盤
+    return now.weekday() < 5 and _MARKET_START <= now.time() <= _MARKET_END
 
 def is_market_open():
-    """檢查台灣股市是否開盤（09:00–13:30，週一至週五，UTC+8）"""
-    tz = pytz.timezone('Asia/Taipei')  # 使用台灣時區
-    now = datetime.now(tz)
-    if now.weekday() >= 5:  # 週六週日不開盤
-        return False
-    market_start = time(9, 0)
-    market_end = time(13, 30)
-    return market_start <= now.time() <= market_end
+    """檢查台灣股市是否開盤（09:00–13:30，週一至週五，UTC+8），結果快取 30 秒"""
+    now = time.monotonic()
+    if now >= _MKT_CACHE[0]:
+        _MKT_CACHE[1] = _compute_is_open()
+        _MKT_CACHE[0] = now + 30
+    return _MKT_CACHE[1]
 
 app = Flask(__name__)
 
@@ -54,7 +87,53 @@ if not LINE_CHANNEL_ACCESS_TOKEN or not LINE_CHANNEL_SECRET:
 line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
+# ---- 分析結果快取 (同一時間區段內重複查詢直接回傳) ----
+_REPORT_CACHE = {}  # (stock_code, bucket) -> (timestamp, report)
+_CACHE_LOCK = threading.Lock()
+
+def _cache_ttl():
+    """盤中資料變動快，快取 60 秒；收盤後 30 分鐘"""
+    return 60 if is_market_open() else 1800
+
+def _cache_get(stock_code):
+    ttl = _cache_ttl()
+    key = (stock_code, int(time.time() // ttl))
+    with _CACHE_LOCK:
+        hit = _REPORT_CACHE.get(key)
+    return hit[1] if hit else None
+
+def _cache_put(stock_code, report):
+    ttl = _cache_ttl()
+    now = time.time()
+    with _CACHE_LOCK:
+        _REPORT_CACHE[(stock_code, int(now // ttl))] = (now, report)
+        # 清掉過期的項目，避免字典無限成長
+        for key in [k for k, (ts, _) in _REPORT_CACHE.items() if now - ts > 2 * ttl]:
+            del _REPORT_CACHE[key]
+
 # ---- 分析函式 ----
+# numba kernel 的輸入型別；pandas Copy-on-Write 下 to_numpy() 可能回傳唯讀陣列，
+# 宣告成唯讀才能同時接受唯讀與一般陣列
+_PRICE_ARRAYS = [types.Array(t, 1, 'A', readonly=True) for t in (types.float32, types.float64)]
+
+@njit([types.UniTuple(types.float64, 2)(a, a, a, a, types.int64) for a in _PRICE_ARRAYS], cache=True)
+def _sr_kernel(open_, high, low, close, start):
+    """從 start 起的陽線計算 (支撐, 壓力)，NaN 不列入平均；沒有可用資料時回傳 nan"""
+    low_cnt = high_cnt = 0
+    low_sum = 0.0
+    high_sum = 0.0
+    for i in range(start, close.shape[0]):
+        if close[i] > open_[i]:
+            if low[i] == low[i]:
+                low_cnt += 1
+                low_sum += low[i]
+            if high[i] == high[i]:
+                high_cnt += 1
+                high_sum += high[i]
+    support = low_sum / low_cnt if low_cnt else np.nan
+    resistance = high_sum / high_cnt if high_cnt else np.nan
+    return support, resistance
+
 def _calculate_support_resistance_from_bullish(df, days=7):
     """
     從最近 N 天的陽線 (Close > Open) 計算支撐與壓力
@@ -64,91 +143,201 @@ def _calculate_support_resistance_from_bullish(df, days=7):
     if df is None or df.empty:
         return None, None
 
-    # 取最近 N 天資料
-    df_recent = df.last(f"{days}D")
+    # 取最近 N 天資料（與 df.last(f"{days}D") 相同的區間，但只做一次二分搜尋，不複製 DataFrame）
+    idx = df.index.values
+    cutoff = idx[-1] - np.timedelta64(days, 'D')
+    start = np.searchsorted(idx, cutoff, side='right')
 
-    # 篩選陽線：收盤價 > 開盤價
-    bullish = df_recent[df_recent['Close'] > df_recent['Open']]
-
-    if bullish.empty:
+    # 篩選陽線：收盤價 > 開盤價，單次迴圈累加，不建立遮罩或篩選後的陣列
+    support, resistance = _sr_kernel(
+        df['Open'].to_numpy(), df['High'].to_numpy(),
+        df['Low'].to_numpy(), df['Close'].to_numpy(), start,
+    )
+    if math.isnan(support) or math.isnan(resistance):
         return None, None
 
-    support = bullish['Low'].mean()
-    resistance = bullish['High'].mean()
-
     return round(support, 2), round(resistance, 2)
 
 def _ensure_single_ticker_df(df, code):
     if isinstance(df.columns, pd.MultiIndex):
         try:
-            tickers = list(df.columns.get_level_values(1).unique())
+            tickers = df.columns.get_level_values(1)
         except Exception:
-            tickers = []
+            return df
+        # 先做 O(1) 的完全比對，找不到才掃一次部分比對
         if code in tickers:
             return df.xs(code, axis=1, level=1)
-        for t in tickers:
-            if code == t or code in t or t in code:
-                return df.xs(t, axis=1, level=1)
-        if tickers:
+        tickers = tickers.unique()
+        match = next((t for t in tickers if code in t or t in code), None)
+        if match is not None:
+            return df.xs(match, axis=1, level=1)
+        if len(tickers):
             print(f"[DEBUG] {code}: MultiIndex returned but exact ticker not found. Using first ticker {tickers[0]} as fallback.")
             return df.xs(tickers[0], axis=1, level=1)
     return df
 
-def calculate_kd_safe(df, n=9):
-    low_min = df['Low'].rolling(window=n, min_periods=1).min()
-    high_max = df['High'].rolling(window=n, min_periods=1).max()
-    denom = (high_max - low_min)
-    rsv = ((df['Close'] - low_min) / denom * 100).where(denom > 0, 50).fillna(50)
-    k = rsv.ewm(com=2, adjust=False).mean()
-    d = k.ewm(com=2, adjust=False).mean()
-    df = df.copy()
-    df['K'] = k
-    df['D'] = d
-    return df
-
-def analyze_stock(stock_code):
+# 明確指定型別簽章：import 時就完成編譯並寫入磁碟快取，不必等第一次呼叫才 JIT
+# fastmath 不含 nnan：資料可能有 NaN，RSV 的 NaN 判斷不能被編譯器省略
+@njit([types.UniTuple(types.float64[:], 2)(a, a, a, types.int64) for a in _PRICE_ARRAYS],
+      cache=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'})
+def _kd_kernel(low, high, close, n):
+    """
+    單次迴圈算出 KD：
+    以單調佇列求 n 期最低價/最高價 (等同 rolling(n, min_periods=1)，NaN 不進佇列)，
+    RSV 做兩次 EMA (等同 ewm(com=2, adjust=False)) 得到 K、D
+    """
+    alpha = 1 / 3.0
+    size = close.shape[0]
+    k = np.empty(size)
+    d = np.empty(size)
+    min_q = np.empty(size, np.int64)
+    max_q = np.empty(size, np.int64)
+    min_head = min_tail = 0
+    max_head = max_tail = 0
+    for i in range(size):
+        # NaN 與任何值比較都是 False，放進佇列會卡住，所以跳過（同 rolling 忽略 NaN）
+        if low[i] == low[i]:
+            while min_tail > min_head and low[min_q[min_tail - 1]] >= low[i]:
+                min_tail -= 1
+            min_q[min_tail] = i
+            min_tail += 1
+        while min_tail > min_head and min_q[min_head] <= i - n:
+            min_head += 1
+
+        if high[i] == high[i]:
+            while max_tail > max_head and high[max_q[max_tail - 1]] <= high[i]:
+                max_tail -= 1
+            max_q[max_tail] = i
+            max_tail += 1
+        while max_tail > max_head and max_q[max_head] <= i - n:
+            max_head += 1
+
+        # 視窗內全是 NaN 時佇列是空的，RSV 視為 50
+        if min_tail == min_head or max_tail == max_head:
+            rsv = 50.0
+        else:
+            low_min = low[min_q[min_head]]
+            denom = high[max_q[max_head]] - low_min
+            rsv = (close[i] - low_min) / denom * 100 if denom > 0 else 50.0
+        if rsv != rsv:
+            rsv = 50.0
+
+        if i == 0:
+            k[i] = rsv
+            d[i] = rsv
+        else:
+            k[i] = alpha * rsv + (1 - alpha) * k[i - 1]
+            d[i] = alpha * k[i] + (1 - alpha) * d[i - 1]
+    return k, d
+
+def calculate_kd(df, n=9):
+    """回傳 (K, D) 兩條 Series，不複製也不修改原本的 df"""
+    k, d = _kd_kernel(df['Low'].to_numpy(), df['High'].to_numpy(), df['Close'].to_numpy(), n)
+    return pd.Series(k, index=df.index), pd.Series(d, index=df.index)
+
+# 啟動時先跑一次，確認編譯/快取載入正常，第一個查詢的使用者不用等
+try:
+    _warmup = np.linspace(1.0, 2.0, 20, dtype=np.float32)
+    _kd_kernel(_warmup, _warmup + 0.5, _warmup - 0.5, 9)
+    _sr_kernel(_warmup - 0.25, _warmup + 0.5, _warmup - 0.5, _warmup, 0)
+except Exception as e:
+    print(f"[WARN] numba kernel warmup failed: {e}")
+
+def _normalize_code(stock_code):
     stock_code = stock_code.strip()
     if '.' not in stock_code:
         stock_code += '.TW'
-    print(f"[INFO] Attempting to download: {stock_code}")
+    return stock_code
 
-    df = None
-    data_source = None
-    max_retries = 3
+def _download(tickers, max_retries=3):
+    """下載 7 天 30 分 K 資料，tickers 可為單一代碼或代碼 list（一次請求批次下載）"""
+    if isinstance(tickers, (list, tuple)):
+        tickers = " ".join(tickers)
+    print(f"[INFO] Attempting to download: {tickers}")
 
+    df = None
     for attempt in range(max_retries):
         try:
-            df = yf.download(stock_code, period="7d", interval="30m", progress=False)
+            # 不自行傳入 session：yfinance 需要自己的 curl_cffi session，也不接受 requests_cache
+            # 重複查詢已由 _REPORT_CACHE 擋掉
+            df = yf.download(tickers, period="7d", interval="30m", threads=True, progress=False)
             if df is not None and not df.empty:
-                print(f"[INFO] {stock_code} downloaded with 7d 30m")
+                print(f"[INFO] {tickers} downloaded with 7d 30m")
                 break
         except Exception as e:
-            print(f"[ERROR] {stock_code} yf.download (7d 30m) attempt {attempt+1}/{max_retries} failed: {e}")
+            print(f"[ERROR] {tickers} yf.download (7d 30m) attempt {attempt+1}/{max_retries} failed: {e}")
             if attempt == max_retries - 1:
-                return f"{stock_code} 資料下載失敗: {e}"
+                raise
+    return df
+
+def _slice_ticker(df_all, code):
+    """從批次下載的 MultiIndex DataFrame 取出單一股票，找不到則回傳 None"""
+    if df_all is None or df_all.empty:
+        return None
+    if isinstance(df_all.columns, pd.MultiIndex):
+        if code not in df_all.columns.get_level_values(1):
+            return None
+        df_all = df_all.xs(code, axis=1, level=1)
+    # 批次下載時各股時間軸會對齊，沒有資料的列整列都是 NaN
+    df_single = df_all.dropna(how='all')
+    return None if df_single.empty else df_single
+
+def analyze_stock(stock_code):
+    stock_code = _normalize_code(stock_code)
+    cached = _cache_get(stock_code)
+    if cached is not None:
+        return cached
+
+    try:
+        df = _download(stock_code)
+    except Exception as e:
+        return f"{stock_code} 資料下載失敗: {e}"
 
     if df is None or df.empty:
         return f"{stock_code} 無法取得資料，請稍後再試"
 
+    report = analyze_from_df(stock_code, df)
+    _cache_put(stock_code, report)
+    return report
+
+_REPORT_TMPL = (
+    "📊 {code}\n"
+    "收盤價: {close:.2f}\n"
+    "支撐: {s:.2f}, 壓力: {r:.2f}\n"
+    "預期報酬率: {er:.2f}%\n"
+    "MA 判斷: {ma}\n"
+    "KD 判斷: {kd}\n"
+    "{advice}\n"
+)
+
+def analyze_from_df(stock_code, df):
+    """分析已下載好的資料（不經過網路）"""
     df = _ensure_single_ticker_df(df, stock_code)
-    df['MA5'] = df['Close'].rolling(window=5, min_periods=1).mean()
-    df['MA20'] = df['Close'].rolling(window=20, min_periods=1).mean()
-    df = calculate_kd_safe(df, n=9)
+    # 只留用得到的 OHLC 並轉成 float32：分析時處理的資料量減半
+    df = df[['Open', 'High', 'Low', 'Close']].astype(np.float32)
+    k_series, d_series = calculate_kd(df, n=9)
 
-    df_clean = df.dropna(subset=['Close', 'MA5', 'MA20', 'K', 'D'])
-    if df_clean.empty or len(df_clean) < 3:  # 確保至少3筆有效數據
-        return f"{stock_code} 資料不足，無法分析（有效列數 {len(df_clean)}）"
+    close = df['Close'].to_numpy()
+    valid_rows = np.count_nonzero(np.isfinite(close))
+    if valid_rows < 3:  # 確保至少3筆有效數據
+        return f"{stock_code} 資料不足，無法分析（有效列數 {valid_rows}）"
 
     try:
-        last_close = float(df_clean['Close'].iloc[-1])
-        ma5 = float(df_clean['MA5'].iloc[-1])
-        ma20 = float(df_clean['MA20'].iloc[-1])
-        last_k = float(df_clean['K'].iloc[-1])
-        last_d = float(df_clean['D'].iloc[-1])
+        last_close = float(close[-1])
+        if not math.isfinite(last_close):
+            return f"{stock_code} 資料不足，最新一筆收盤價無效"
+        # 只需要最後一根的均線，直接取最後 N 筆平均（略過 NaN），不必算整條 rolling
+        ma5 = float(np.nanmean(close[-5:]))
+        ma20 = float(np.nanmean(close[-20:]))
+        last_k = float(k_series.iloc[-1])
+        last_d = float(d_series.iloc[-1])
     except Exception as e:
         print(f"[ERROR] {stock_code} value extraction failed: {e}")
         return f"{stock_code} 資料解析失敗: {e}"
 
+    if math.isnan(last_k) or math.isnan(last_d):
+        return f"{stock_code} 資料不足，無法計算 KD"
+
     #recent_n = min(5, len(df_clean))
     #support = float(df_clean['Low'].tail(recent_n).median())
     #resistance = float(df_clean['High'].tail(recent_n).median())
@@ -156,7 +345,7 @@ def analyze_stock(stock_code):
     #resistance = round(resistance, 2)
 
     # --- 改用「近 7 天陽線」計算支撐壓力 ---
-    support, resistance = _calculate_support_resistance_from_bullish(df_clean, days=7)
+    support, resistance = _calculate_support_resistance_from_bullish(df, days=7)
     if support is None or resistance is None:
         return f"{stock_code} 找不到足夠的陽線資料，無法計算支撐/壓力"
 
@@ -187,20 +376,106 @@ def analyze_stock(stock_code):
         advice = "建議: HOLD ⏸"
         expected_return = 0.0
 
-    report = (
-        f"📊 {stock_code}\n"
-        f"收盤價: {last_close:.2f}\n"
-        f"支撐: {support:.2f}, 壓力: {resistance:.2f}\n"
-        f"預期報酬率: {expected_return:.2f}%\n"
-        f"MA 判斷: {ma_signal}\n"
-        f"KD 判斷: {kd_signal}\n"
-        f"{advice}\n"
-    )
+    report = _REPORT_TMPL.format_map({
+        'code': stock_code,
+        'close': last_close,
+        's': support,
+        'r': resistance,
+        'er': expected_return,
+        'ma': ma_signal,
+        'kd': kd_signal,
+        'advice': advice,
+    })
 
-    print(f"[INFO] {stock_code} processed: rows={len(df_clean)}, last_close={last_close}, ma5={ma5}, ma20={ma20}, K={last_k:.2f}, D={last_d:.2f}")
+    print(f"[INFO] {stock_code} processed: rows={len(df)}, last_close={last_close}, ma5={ma5}, ma20={ma20}, K={last_k:.2f}, D={last_d:.2f}")
 
     return report
 
+# 共用執行緒池，避免每次請求重新建立執行緒
+_EXECUTOR = ThreadPoolExecutor(max_workers=8)
+
+def _safe_analyze(code, df_all):
+    """分析單一代碼；批次成功但缺這檔時才單獨下載，例外轉成錯誤訊息"""
+    # 整批下載失敗或沒有任何資料（例如被 Yahoo 限流）時不逐檔重抓，避免在最糟的時候再打 3×N 次
+    if df_all is None:
+        return f"{code} 資料下載失敗，請稍後再試"
+    try:
+        df_single = _slice_ticker(df_all, code)
+        if df_single is None:
+            return analyze_stock(code)
+        res = analyze_from_df(code, df_single)
+        _cache_put(code, res)
+        return res
+    except Exception as e:
+        return f"{code} 分析失敗: {e}"
+
+# 回覆用的背景執行緒池；與 _EXECUTOR 分開，避免互相等待而卡住
+_REPLY_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+REPLY_TOKEN_TTL = 25  # 秒，保守估計 reply token 的有效時間
+# 最長的報告約 150 字（.TWO 代碼、五位數價格、超買 KD 訊號），留點餘裕抓 160
+_REPORT_MAX_LEN = 160
+# 一則回覆最多分析的代碼數：全部報告一定放得進 4900 字，多的代碼不下載也不分析
+MAX_CODES = 4900 // (_REPORT_MAX_LEN + 2)
+
+def _build_reply(codes):
+    """產生多檔股票的回覆文字"""
+    skipped = len(codes) - MAX_CODES
+    codes = codes[:MAX_CODES]
+
+    # 先查快取，只有沒命中的代碼才需要下載
+    reports = {code: _cache_get(code) for code in codes}
+    missing = [code for code, res in reports.items() if res is None]
+
+    # 沒命中的代碼一次批次下載，再逐檔分析
+    if missing:
+        try:
+            df_all = _download(missing)
+        except Exception as e:
+            df_all = None
+            print(f"[ERROR] batch download {missing} failed: {e}")
+        # yfinance 會吞掉各檔錯誤、回傳空的 DataFrame，整批沒資料一樣視為失敗
+        if df_all is not None and df_all.empty:
+            df_all = None
+
+        # 各檔分析（以及成功批次中漏掉、需單獨重抓的代碼）平行處理
+        analyzed = _EXECUTOR.map(lambda c: _safe_analyze(c, df_all), missing)
+        reports.update(zip(missing, analyzed))
+
+    # 逐檔累加，超過 4900 字就停，不組出會被截掉的尾段
+    parts = []
+    total = 0
+    too_long = False
+    for code in codes:
+        res = reports[code]
+        if total + len(res) + 2 > 4900:
+            if not parts:
+                parts.append(res[:4900])
+            too_long = True
+            break
+        parts.append(res)
+        total += len(res) + 2
+    if too_long:
+        parts.append("(結果過長，已截斷)")
+    elif skipped > 0:
+        parts.append(f"(一次最多查詢 {MAX_CODES} 檔，其餘 {skipped} 檔未分析)")
+
+    return "\n\n".join(parts)
+
+def _do_analyze_and_reply(reply_token, source, codes, received_at):
+    """背景工作：分析後回覆使用者，reply token 過期時改用 push"""
+    try:
+        message = TextSendMessage(text=_build_reply(codes))
+        # reply token 時效有限，處理太久就改用 push_message
+        if time.monotonic() - received_at < REPLY_TOKEN_TTL:
+            try:
+                line_bot_api.reply_message(reply_token, message)
+                return
+            except LineBotApiError as e:
+                print(f"[ERROR] reply_message failed, falling back to push: {e}")
+        line_bot_api.push_message(source.sender_id, message)
+    except Exception as e:
+        print(f"[ERROR] analyze and reply {codes} failed: {e}")
+
 # ---- Flask / LINE webhook ----
 @app.route("/callback", methods=["POST"])
 def callback():
@@ -221,8 +496,8 @@ def handle_message(event):
     user_text = event.message.text.strip()
 
     # 檢查是不是至少有一個股票代碼
-    codes = [c.strip() + '.TW' if '.' not in c.strip() else c.strip()
-             for c in user_text.split(",") if is_stock_code(c.strip())]
+    tokens = (c.strip() for c in user_text.split(","))
+    codes = [c if '.' in c else c + '.TW' for c in tokens if is_stock_code(c)]
 
     if not codes:  # 如果不是股票代碼，就當一般聊天
         #line_bot_api.reply_message(
@@ -231,22 +506,5 @@ def handle_message(event):
         #)
         return
 
-    # 原本的股票分析流程
-    results = []
-    for code in codes:
-        try:
-            res = analyze_stock(code)
-        except Exception as e:
-            res = f"{code} 分析失敗: {e}"
-        results.append(res)
-
-    reply_text = "\n\n".join(results)
-    if len(reply_text) > 4900:
-        reply_text = reply_text[:4900] + "\n\n(結果過長，已截斷)"
-
-    line_bot_api.reply_message(event.reply_token, TextSendMessage(text=reply_text))
-
-
-if __name__ == "__main__":
-    #port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=10000)
\ No newline at end of file
+    # 下載與分析放到背景執行，webhook 立即回 200，避免 LINE 逾時重送
+    _REPLY_EXECUTOR.submit(_do_analyze_and_reply, event.reply_token, event.source, codes, time.monotonic())